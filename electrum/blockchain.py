@@ -21,6 +21,7 @@
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import os
+import struct
 import threading
 import time
 from typing import Optional, Dict, Mapping, Sequence, TYPE_CHECKING
@@ -39,6 +40,7 @@ _logger = get_logger(__name__)
 
 HEADER_SIZE = 80  # bytes
 CHUNK_SIZE = 2016  # num headers in a difficulty retarget period
+_HEADER_STRUCT = struct.Struct("<I32s32sIII")  # version, prev_block_hash, merkle_root, timestamp, bits, nonce
 
 # see https://github.com/bitcoin/bitcoin/blob/feedb9c84e72e4fff489810a2bbeec09bcda5763/src/chainparams.cpp#L76
 MAX_TARGET = 0x00000000ffffffffffffffffffffffffffffffffffffffffffffffffffffffff  # compact: 0x1d00ffff
@@ -68,13 +70,14 @@ def deserialize_header(s: bytes, height: int) -> dict:
         raise InvalidHeader('Invalid header: {}'.format(s))
     if len(s) != HEADER_SIZE:
         raise InvalidHeader('Invalid header length: {}'.format(len(s)))
+    version, prev_block_hash, merkle_root, timestamp, bits, nonce = _HEADER_STRUCT.unpack(s)
     h = {}
-    h['version'] = int.from_bytes(s[0:4], byteorder='little')
-    h['prev_block_hash'] = hash_encode(s[4:36])
-    h['merkle_root'] = hash_encode(s[36:68])
-    h['timestamp'] = int.from_bytes(s[68:72], byteorder='little')
-    h['bits'] = int.from_bytes(s[72:76], byteorder='little')
-    h['nonce'] = int.from_bytes(s[76:80], byteorder='little')
+    h['version'] = version
+    h['prev_block_hash'] = hash_encode(prev_block_hash)
+    h['merkle_root'] = hash_encode(merkle_root)
+    h['timestamp'] = timestamp
+    h['bits'] = bits
+    h['nonce'] = nonce
     h['block_height'] = height
     return h
 
@@ -1,77 +1,117 @@
-from typing import TYPE_CHECKING, Optional
-from functools import partial
+from typing import TYPE_CHECKING, Optional, Dict
+from functools import partial, lru_cache
+from operator import itemgetter
 import shutil
 import os
 
 from PyQt6.QtWidgets import QLabel, QVBoxLayout, QHBoxLayout, QGridLayout, QPushButton, QWidget, QScrollArea, \
     QFormLayout, QFileDialog, QMenu, QApplication, QMessageBox
 from PyQt6.QtCore import QTimer
+from PyQt6.QtGui import QIcon, QImage, QPixmap
 
 from electrum.i18n import _
 from electrum.gui import messages
 from electrum.logging import get_logger
+from electrum.plugin import get_file_hash256
+from electrum.gui.common_qt.util import TaskThread
 
 from .util import (WindowModalDialog, Buttons, CloseButton, WWLabel, insert_spaces, MessageBoxMixin,
-                   EnterButton, read_QIcon_from_bytes, IconLabel, RunCoroutineDialog, read_QIcon,
-                   webopen)
+                   EnterButton, IconLabel, RunCoroutineDialog, read_QIcon,
+                   webopen, ColorScheme)
+from .password_dialog import NewPasswordDialog
 
 
 if TYPE_CHECKING:
     from . import ElectrumGui
     from electrum_ecc import ECPrivkey
     from electrum.simple_config import SimpleConfig
-    from electrum.plugin import Plugins
+    from electrum.plugin import Plugins, PluginStatus
+
+
+@lru_cache(maxsize=128)
+def _load_plugin_image(plugins: 'Plugins', name: str, icon_path: str, mtime: float) -> QImage:
+    # mtime is only part of the cache key, so that a replaced zip file gets read again
+    # note: unlike QPixmap, QImage can be used outside the GUI thread
+    image = QImage()
+    image.loadFromData(plugins.read_file(name, icon_path))
+    return image
+
+
+def get_plugin_image(plugins: 'Plugins', name: str, icon_path: str) -> QImage:
+    mtime = os.path.getmtime(plugins.zip_plugin_path(name)) if plugins.is_plugin_zip(name) else 0
+    return _load_plugin_image(plugins, name, icon_path, mtime)
+
+
+def get_plugin_icon(plugins: 'Plugins', name: str, icon_path: str) -> QIcon:
+    return QIcon(QPixmap.fromImage(get_plugin_image(plugins, name, icon_path)))
 
 
 class PluginDialog(WindowModalDialog):
 
+    # metadata key, word-wrap, function computing the display string
+    FORM_ROWS = (
+        ('author', False, None),
+        ('version', False, None),
+        ('zip_hash_sha256', True, lambda zip_hash: insert_spaces(zip_hash, 8)),
+        ('requires', True, lambda requires: '\n'.join(map(itemgetter(1), requires))),
+    )
+    _field_labels = None  # type: Optional[Dict[str, str]]
+
+    @classmethod
+    def get_field_labels(cls) -> Dict[str, str]:
+        # translated on first use, as the language is only set on startup
+        if cls._field_labels is None:
+            cls._field_labels = {
+                'author': _('Author') + ':',
+                'version': _('Version') + ':',
+                'zip_hash_sha256': 'Hash [sha256]:',
+                'requires': _('Requires') + ':',
+            }
+        return cls._field_labels
+
     def __init__(self, name, metadata, status_button: Optional['PluginStatusButton'], window: 'PluginsDialog'):
         display_name = metadata.get('fullname', '')
-        author = metadata.get('author', '')
         description = metadata.get('description', '')
-        requires = metadata.get('requires')
-        version = metadata.get('version')
-        zip_hash = metadata.get('zip_hash_sha256', None)
         icon_path = metadata.get('icon')
 
         WindowModalDialog.__init__(self, window, 'Plugin')
         self.setMinimumSize(400, 250)
         self.window = window
-        self.metadata = metadata
         self.plugins = self.window.plugins
         self.name = name
         self.status_button = status_button
-        p = self.plugins.get(name)  # is enabled
+        status = self.window.get_plugin_status(name)
+        is_authorized = status.internal or self.plugins.is_authorized(name)
+        if not is_authorized and self.plugins.is_plugin_zip(name):
+            # show the hash of the file that do_authorize will sign, not the one from the manifest cache
+            zip_hash = get_file_hash256(self.plugins.zip_plugin_path(name)).hex()
+            metadata = dict(metadata, zip_hash_sha256=zip_hash)
+        self.metadata = metadata
         vbox = QVBoxLayout(self)
         name_label = IconLabel(text=display_name, reverse=True)
         if icon_path:
             name_label.icon_size = 64
-            icon = read_QIcon_from_bytes(self.plugins.read_file(name, icon_path))
+            icon = get_plugin_icon(self.plugins, name, icon_path)
             name_label.setIcon(icon)
         vbox.addWidget(name_label)
         vbox.addStretch()
         vbox.addWidget(WWLabel(description))
         vbox.addStretch()
         form = QFormLayout(None)
-        if author:
-            form.addRow(QLabel(_('Author') + ':'), QLabel(author))
-        if version:
-            form.addRow(QLabel(_('Version') + ':'), QLabel(version))
-        if zip_hash:
-            form.addRow(QLabel('Hash [sha256]:'), WWLabel(insert_spaces(zip_hash, 8)))
-        if requires:
-            msg = '\n'.join(map(lambda x: x[1], requires))
-            form.addRow(QLabel(_('Requires') + ':'), WWLabel(msg))
+        field_labels = self.get_field_labels()
+        for key, word_wrap, to_text in self.FORM_ROWS:
+            if not (value := metadata.get(key)):
+                continue
+            if to_text is not None:
+                value = to_text(value)
+            form.addRow(QLabel(field_labels[key]), WWLabel(value) if word_wrap else QLabel(value))
         vbox.addLayout(form)
         vbox.addStretch()
         close_button = CloseButton(self)
         close_button.setText(_('Close'))
         buttons = [close_button]
-        p = self.plugins.get(name)
-        is_enabled = p and p.is_enabled()
-        is_external = self.plugins.is_external(name)
-        if is_external:
-            is_authorized = self.plugins.is_authorized(name)
+        is_enabled = status.enabled
+        if not status.internal:
             if status_button is not None:
                 # status_button is None when called from add_external_plugin
                 remove_button = QPushButton('')
@@ -88,7 +128,8 @@ class PluginDialog(WindowModalDialog):
             toggle_button.clicked.connect(self.do_toggle)
             buttons.insert(0, toggle_button)
         # add settings button
-        if p and p.requires_settings() and p.is_enabled():
+        if status.requires_settings and status.enabled:
+            p = self.plugins.get(name)
             settings_button = EnterButton(
                 _('Settings'),
                 partial(p.settings_dialog, self))
@@ -120,6 +161,7 @@ class PluginDialog(WindowModalDialog):
         filename = self.plugins.zip_plugin_path(self.name)
         self.window.plugins.authorize_plugin(self.name, filename, privkey)
         self.window.plugins.enable(self.name)
+        self.window.update_plugin_status(self.name)
         d = self.plugins.get_metadata(self.name)
         if details := d.get('registers_keystore'):
             self.plugins.register_keystore(self.name, details)
@@ -140,16 +182,15 @@ class PluginStatusButton(QPushButton):
 
     def show_plugin_dialog(self):
         metadata = self.plugins.descriptions[self.name]
+        # the plugin might have been enabled or disabled from somewhere else since the list was shown
+        self.window.update_plugin_status(self.name)
         d = PluginDialog(self.name, metadata, self, self.window)
         d.exec()
 
     def update(self):
-        from .util import ColorScheme
-        p = self.plugins.get(self.name)
-        plugin_is_loaded = p is not None
-        enabled = not plugin_is_loaded or (plugin_is_loaded and p.can_user_disable())
-        self.setEnabled(enabled)
-        if p is not None and p.is_enabled():
+        status = self.window.get_plugin_status(self.name)
+        self.setEnabled(status.can_user_disable)
+        if status.enabled:
             text, color = _('Enabled'), ColorScheme.BLUE
         else:
             text, color = _('Disabled'), ColorScheme.RED
@@ -165,6 +206,9 @@ class PluginsDialog(WindowModalDialog, MessageBoxMixin):
         self.gui_object = gui_object
         self.config = config
         self.plugins = plugins
+        self._rows = {}  # type: Dict[str, IconLabel]
+        self._last_row = 0
+        self._status_snapshot = None  # type: Optional[Dict[str, PluginStatus]]
         vbox = QVBoxLayout(self)
         scroll = QScrollArea()
         scroll.setEnabled(True)
@@ -188,8 +232,30 @@ class PluginsDialog(WindowModalDialog, MessageBoxMixin):
         hbox.addWidget(add_button)
         hbox.addWidget(CloseButton(self))
         vbox.addLayout(hbox)
+        self.thread = TaskThread(self)
+        self.finished.connect(self.on_finished)
         self.show_list()
 
+    def on_finished(self):
+        self.thread.stop()
+
+    def get_plugin_status(self, name: str) -> 'PluginStatus':
+        if self._status_snapshot is None:
+            self._status_snapshot = self.plugins.status_snapshot()
+        return self._status_snapshot[name]
+
+    def invalidate_plugin_status(self):
+        self._status_snapshot = None
+
+    def update_plugin_status(self, name: str):
+        """Refreshes the status of a single plugin after it has changed."""
+        if self._status_snapshot is None:
+            return
+        if self.plugins.is_installed(name):
+            self._status_snapshot[name] = self.plugins.get_status(name)
+        else:
+            self._status_snapshot.pop(name, None)
+
     def get_plugins_privkey(self) -> Optional['ECPrivkey']:
         pubkey, salt = self.plugins.get_pubkey_bytes()
         if not pubkey:
@@ -234,7 +300,6 @@ class PluginsDialog(WindowModalDialog, MessageBoxMixin):
         return privkey
 
     def init_plugins_password(self):
-        from .password_dialog import NewPasswordDialog
         msg = ' '.join([
             _('In order to install third-party plugins, you need to choose a plugin authorization password.'),
             _('Its purpose is to prevent unauthorized users (or malware) from installing plugins.'),
@@ -318,41 +383,67 @@ class PluginsDialog(WindowModalDialog, MessageBoxMixin):
         manifest = self.plugins.read_manifest(path)
         name = manifest['name']
         self.plugins.external_plugin_metadata[name] = manifest
+        self.update_plugin_status(name)
         d = PluginDialog(name, manifest, None, self)
         if not d.exec():
             self.plugins.external_plugin_metadata.pop(name)
+            self.update_plugin_status(name)
+            _load_plugin_image.cache_clear()
             return False
         if self.gui_object:
             self.gui_object.reload_windows()
-        self.show_list()
+        # appended at the end, the list gets sorted again when the dialog is reopened
+        self._remove_row(name)
+        if manifest.get('fullname'):  # same rule as Plugins.get_visible_names
+            self._add_row(name, manifest)
         return True
 
     def show_list(self):
         descriptions = self.plugins.descriptions
-        descriptions = sorted(descriptions.items())
+        names = self.plugins.get_visible_names()
+        self.invalidate_plugin_status()
+        scroll_w = self.grid.parentWidget()
+        scroll_w.setUpdatesEnabled(False)
+        try:
+            for name in names:
+                self._add_row(name, descriptions[name])
+        finally:
+            scroll_w.setUpdatesEnabled(True)
+
+    def _add_row(self, name: str, metadata: dict) -> None:
+        label = IconLabel(text=metadata['fullname'], reverse=True)
+        icon_path = metadata.get('icon')
+        if icon_path:
+            # decode icons in the background, so that the dialog can be painted right away
+            self.thread.add(
+                partial(get_plugin_image, self.plugins, name, icon_path),
+                on_success=partial(self._on_icon_decoded, name, label),
+                on_error=partial(self._on_icon_error, name))
+        label.status_button = PluginStatusButton(self, name)
+        # move the stretch below the new row
         grid = self.grid
-        # clear existing items
-        for i in reversed(range(grid.count())):
-            grid.itemAt(i).widget().setParent(None)
-        # populate
-        i = 0
-        for name, metadata in descriptions:
-            i += 1
-            if self.plugins.is_internal(name) and self.plugins.is_auto_loaded(name):
-                continue
-            display_name = metadata.get('fullname')
-            if not display_name:
-                continue
-            label = IconLabel(text=display_name, reverse=True)
-            icon_path = metadata.get('icon')
-            if icon_path:
-                icon = read_QIcon_from_bytes(self.plugins.read_file(name, icon_path))
-                label.setIcon(icon)
-            label.status_button = PluginStatusButton(self, name)
-            grid.addWidget(label, i, 0)
-            grid.addWidget(label.status_button, i, 1)
-        # add stretch
-        grid.setRowStretch(i + 1, 1)
+        grid.setRowStretch(self._last_row + 1, 0)
+        self._last_row += 1
+        grid.addWidget(label, self._last_row, 0)
+        grid.addWidget(label.status_button, self._last_row, 1)
+        grid.setRowStretch(self._last_row + 1, 1)
+        self._rows[name] = label
+
+    def _remove_row(self, name: str) -> None:
+        label = self._rows.pop(name, None)
+        if label is None:
+            return
+        for widget in (label, label.status_button):
+            self.grid.removeWidget(widget)
+            widget.deleteLater()
+
+    def _on_icon_decoded(self, name: str, label: IconLabel, image: QImage):
+        if self._rows.get(name) is not label:
+            return  # row got removed in the meantime, label is being deleted
+        label.setIcon(QIcon(QPixmap.fromImage(image)))
+
+    def _on_icon_error(self, name: str, exc_info):
+        self._logger.error(f"could not load icon of plugin {name}", exc_info=exc_info)
 
     def do_toggle(self, name, status_button):
         p = self.plugins.get(name)
@@ -361,6 +452,7 @@ class PluginsDialog(WindowModalDialog, MessageBoxMixin):
             self.plugins.disable(name)
         else:
             self.plugins.enable(name)
+        self.update_plugin_status(name)
         if status_button:
             status_button.update()
         if self.gui_object:
@@ -371,9 +463,11 @@ class PluginsDialog(WindowModalDialog, MessageBoxMixin):
         if not self.question(_('Remove plugin \'{}\'?').format(name)):
             return
         self.plugins.uninstall(name)
+        self.update_plugin_status(name)
+        _load_plugin_image.cache_clear()
         if self.gui_object:
             self.gui_object.reload_windows()
-        self.show_list()
+        self._remove_row(name)
         self.bring_to_front()
 
     def bring_to_front(self):
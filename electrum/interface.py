@@ -29,9 +29,10 @@ import sys
 import time
 import traceback
 import asyncio
+import bisect
 import socket
+import threading
 from typing import Tuple, Union, List, TYPE_CHECKING, Optional, Set, NamedTuple, Any, Sequence, Dict
-from collections import defaultdict
 from ipaddress import IPv4Network, IPv6Network, ip_address, IPv6Address, IPv4Address
 import itertools
 import logging
@@ -57,6 +58,7 @@ from . import pem
 from . import version
 from . import blockchain
 from .blockchain import Blockchain, HEADER_SIZE, CHUNK_SIZE
+from .crypto import sha256d
 from . import bitcoin
 from .bitcoin import DummyAddress, DummyAddressUsedInTxException
 from . import constants
@@ -73,6 +75,20 @@ if TYPE_CHECKING:
 
 ca_path = certifi.where()
 
+_CA_CTX_LOCK = threading.Lock()
+_CA_CTX = None  # type: Optional[ssl.SSLContext]
+
+
+def _get_ca_ssl_context() -> ssl.SSLContext:
+    """Returns an SSL context that verifies against the certifi CA bundle.
+    It is shared by all interfaces, so callers must not mutate it.
+    """
+    global _CA_CTX
+    with _CA_CTX_LOCK:
+        if _CA_CTX is None:
+            _CA_CTX = ssl.create_default_context(purpose=ssl.Purpose.SERVER_AUTH, cafile=ca_path)
+        return _CA_CTX
+
 BUCKET_NAME_OF_ONION_SERVERS = 'onion'
 
 KNOWN_ELEC_PROTOCOL_TRANSPORTS = {'t', 's'}
@@ -82,6 +98,12 @@ assert PREFERRED_NETWORK_PROTOCOL in KNOWN_ELEC_PROTOCOL_TRANSPORTS
 MAX_NUM_HEADERS_PER_REQUEST = 2016
 assert MAX_NUM_HEADERS_PER_REQUEST >= CHUNK_SIZE
 
+# number of binary search steps whose candidate headers are fetched in a single round-trip
+BINARY_SEARCH_PREFETCH_DEPTH = 3
+
+# how long handle_disconnect waits for the tasks of an interface to get cancelled
+TASKGROUP_CANCEL_TIMEOUT_SECONDS = 5
+
 
 class NetworkTimeout:
     # seconds
@@ -126,6 +148,20 @@ def assert_hex_str(val: Any) -> None:
         raise RequestCorrupted(f'{val!r} should be a hex str')
 
 
+def assert_hex_str_and_decode(val: Any) -> bytes:
+    """Validates and decodes the hex str in a single pass over it."""
+    if not isinstance(val, str):
+        raise RequestCorrupted(f'{val!r} should be a hex str')
+    try:
+        b = bytes.fromhex(val)
+    except ValueError:
+        raise RequestCorrupted(f'{val!r} should be a hex str') from None
+    # forbid whitespaces in val:
+    if len(val) != 2 * len(b):
+        raise RequestCorrupted(f'{val!r} should be a hex str')
+    return b
+
+
 def assert_dict_contains_field(d: Any, *, field_name: str) -> Any:
     if not isinstance(d, dict):
         raise RequestCorrupted(f'{d!r} should be a dict')
@@ -139,6 +175,20 @@ def assert_list_or_tuple(val: Any) -> None:
         raise RequestCorrupted(f'{val!r} should be a list or tuple')
 
 
+def assert_list_of_hash256_str(val: Any) -> None:
+    assert_list_or_tuple(val)
+    # fast path: a single hex decode for the whole list
+    if all(isinstance(item, str) and len(item) == 64 for item in val):
+        try:
+            if len(bytes.fromhex("".join(val))) == 32 * len(val):
+                return
+        except ValueError:
+            pass
+    for item in val:  # find the culprit
+        assert_hash256_str(item)
+    raise RequestCorrupted(f'{val!r} should be a list of hash256 strs')
+
+
 def protocol_tuple(s: Any) -> tuple[int, ...]:
     """Converts a protocol version number, such as "1.0" to a tuple (1, 0).
 
@@ -163,7 +213,11 @@ class NotificationSession(RPCSession):
 
     def __init__(self, *args, interface: 'Interface', **kwargs):
         super(NotificationSession, self).__init__(*args, **kwargs)
-        self.subscriptions = defaultdict(list)
+        self.subscriptions = {}  # type: Dict[Tuple[str, tuple], Set[asyncio.Queue]]
+        self._subscription_keys_by_queue = {}  # type: Dict[asyncio.Queue, Set[Tuple[str, tuple]]]
+        # every key ever subscribed to. we can't unsubscribe from the server,
+        # so it might keep sending notifications for any of these.
+        self._subscribed_keys = set()  # type: Set[Tuple[str, tuple]]
         self.cache = {}
         self._msg_counter = itertools.count(start=1)
         self.interface = interface
@@ -175,15 +229,19 @@ class NotificationSession(RPCSession):
         #self.verbosity = 4
 
     async def handle_request(self, request):
-        self.maybe_log(f"--> {request}")
+        if self.is_debug_logging_enabled():
+            self.maybe_log(f"--> {request}")
         try:
             if isinstance(request, Notification):
                 params, result = request.args[:-1], request.args[-1]
                 key = self.get_hashable_key_for_rpc_call(request.method, params)
-                if key in self.subscriptions:
+                # note: this includes keys we have unsubscribed from locally,
+                #       as the server keeps sending notifications for them
+                if key in self._subscribed_keys:
                     self.cache[key] = result
-                    for queue in self.subscriptions[key]:
-                        await queue.put(request.args)
+                    # note: subscription queues are unbounded, so this never raises QueueFull
+                    for queue in self.subscriptions.get(key, ()):
+                        queue.put_nowait(request.args)
                 else:
                     raise Exception(f'unexpected notification')
             else:
@@ -196,7 +254,10 @@ class NotificationSession(RPCSession):
         # note: semaphores/timeouts/backpressure etc are handled by
         # aiorpcx. the timeout arg here in most cases should not be set
         msg_id = next(self._msg_counter)
-        self.maybe_log(f"<-- {args} {kwargs} (id: {msg_id})")
+        # note: the log messages are only formatted if they are going to be logged,
+        #       as e.g. tx broadcast args can be large
+        if self.is_debug_logging_enabled():
+            self.maybe_log(f"<-- {args} {kwargs} (id: {msg_id})")
         try:
             # note: RPCSession.send_request raises TaskTimeout in case of a timeout.
             # TaskTimeout is a subclass of CancelledError, which is *suppressed* in TaskGroups
@@ -204,16 +265,20 @@ class NotificationSession(RPCSession):
                 super().send_request(*args, **kwargs),
                 timeout)
         except (TaskTimeout, asyncio.TimeoutError) as e:
-            self.maybe_log(f"--> request timed out: {args} (id: {msg_id})")
+            if self.is_debug_logging_enabled():
+                self.maybe_log(f"--> request timed out: {args} (id: {msg_id})")
             raise RequestTimedOut(f'request timed out: {args} (id: {msg_id})') from e
         except CodeMessageError as e:
-            self.maybe_log(f"--> {repr(e)} (id: {msg_id})")
+            if self.is_debug_logging_enabled():
+                self.maybe_log(f"--> {repr(e)} (id: {msg_id})")
             raise
         except BaseException as e:  # cancellations, etc. are useful for debugging
-            self.maybe_log(f"--> {repr(e)} (id: {msg_id})")
+            if self.is_debug_logging_enabled():
+                self.maybe_log(f"--> {repr(e)} (id: {msg_id})")
             raise
         else:
-            self.maybe_log(f"--> {response} (id: {msg_id})")
+            if self.is_debug_logging_enabled():
+                self.maybe_log(f"--> {response} (id: {msg_id})")
             return response
 
     def set_default_timeout(self, timeout):
@@ -226,7 +291,9 @@ class NotificationSession(RPCSession):
         # note: until the cache is written for the first time,
         # each 'subscribe' call might make a request on the network.
         key = self.get_hashable_key_for_rpc_call(method, params)
-        self.subscriptions[key].append(queue)
+        self._subscribed_keys.add(key)
+        self.subscriptions.setdefault(key, set()).add(queue)
+        self._subscription_keys_by_queue.setdefault(queue, set()).add(key)
         if key in self.cache:
             result = self.cache[key]
         else:
@@ -238,18 +305,23 @@ class NotificationSession(RPCSession):
         """Unsubscribe a callback to free object references to enable GC."""
         # note: we can't unsubscribe from the server, so we keep receiving
         # subsequent notifications
-        for v in self.subscriptions.values():
-            if queue in v:
-                v.remove(queue)
+        for key in self._subscription_keys_by_queue.pop(queue, ()):
+            queues = self.subscriptions[key]
+            queues.discard(queue)
+            if not queues:
+                del self.subscriptions[key]
 
     @classmethod
-    def get_hashable_key_for_rpc_call(cls, method, params):
+    def get_hashable_key_for_rpc_call(cls, method, params) -> Tuple[str, tuple]:
         """Hashable index for subscriptions and cache"""
-        return str(method) + repr(params)
+        return str(method), tuple(params)
+
+    def is_debug_logging_enabled(self) -> bool:
+        if not self.interface: return False
+        return self.interface.debug or self.interface.network.debug
 
     def maybe_log(self, msg: str) -> None:
-        if not self.interface: return
-        if self.interface.debug or self.interface.network.debug:
+        if self.is_debug_logging_enabled():
             self.interface.logger.debug(msg)
 
     def default_framer(self):
@@ -347,16 +419,21 @@ class PaddedRSTransport(RSTransport):
     # (unpadded) amount of bytes sent instantly before beginning with polling.
     # This makes the initial handshake where a few small messages are exchanged faster.
     WARMUP_BUDGET_SIZE = 1024
+    _PADDING = 64 * 1024 * b" "
 
     session: Optional['RPCSession']
 
     def __init__(self, *args, **kwargs):
         RSTransport.__init__(self, *args, **kwargs)
         self._sbuffer = bytearray()  # "send buffer"
+        # stream offsets where the framed messages in sbuffer end, and num bytes consumed from sbuffer so far
+        self._sbuffer_frame_ends = []  # type: List[int]
+        self._sbuffer_base = 0
         self._sbuffer_task = None  # type: Optional[asyncio.Task]
         self._sbuffer_has_data_evt = asyncio.Event()
-        self._last_send = time.monotonic()
+        self._last_send = self.loop.time()
         self._force_send = False  # type: bool
+        self._flush_scheduled = False  # type: bool
 
     # note: this does not call super().write() but is a complete reimplementation
     async def write(self, message):
@@ -364,8 +441,16 @@ class PaddedRSTransport(RSTransport):
         if self.is_closing():
             return
         framed_message = self._framer.frame(message)
-        self._sbuffer += framed_message
+        self._sbuffer.extend(framed_message)
+        self._sbuffer_frame_ends.append(self._sbuffer_base + len(self._sbuffer))
         self._sbuffer_has_data_evt.set()
+        # defer to the next event loop iteration, so that a burst of writes gets coalesced
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.loop.call_soon(self._deferred_flush)
+
+    def _deferred_flush(self) -> None:
+        self._flush_scheduled = False
         self._maybe_consume_sbuffer()
 
     def _maybe_consume_sbuffer(self) -> None:
@@ -379,7 +464,7 @@ class PaddedRSTransport(RSTransport):
         if not (
             self._force_send
             or len(buf) >= self.MIN_PACKET_SIZE
-            or self._last_send + self.WAIT_FOR_BUFFER_GROWTH_SECONDS < time.monotonic()
+            or self._last_send + self.WAIT_FOR_BUFFER_GROWTH_SECONDS < self.loop.time()
             or self.session.send_size < self.WARMUP_BUDGET_SIZE
         ):
             return
@@ -391,11 +476,13 @@ class PaddedRSTransport(RSTransport):
         # or if that wasted a lot of bandwidth with padding, (2) defer sending some messages
         # and create a packet with half that size ("ssize", s for small)
         total_ssize = max(self.MIN_PACKET_SIZE, total_lsize // 2)
-        payload_ssize = buf.rfind(b"\n", 0, total_ssize)
-        if payload_ssize != -1:
-            payload_ssize += 1  # for "\n" char
+        base = self._sbuffer_base
+        frame_idx = bisect.bisect_right(self._sbuffer_frame_ends, base + total_ssize)
+        if frame_idx > 0:
+            payload_ssize = self._sbuffer_frame_ends[frame_idx - 1] - base  # incl. "\n" char
             npad_ssize = total_ssize - payload_ssize
         else:
+            payload_ssize = -1
             npad_ssize = float("inf")
         # decide between (1) and (2):
         if self._force_send or npad_lsize <= npad_ssize:
@@ -414,10 +501,18 @@ class PaddedRSTransport(RSTransport):
         # )
         json_rpc_terminator = buf[p_idx-2:p_idx]
         assert json_rpc_terminator in (b"}\n", b"]\n"), f"unexpected {json_rpc_terminator=!r}"
-        buf2 = buf[:p_idx-2] + (npad * b" ") + json_rpc_terminator
-        self._asyncio_transport.write(buf2)
-        self._last_send = time.monotonic()
+        # build the packet in a single bytearray, taking the padding from a preallocated buffer
+        packet = buf[:p_idx-2]
+        if npad <= len(self._PADDING):
+            packet += memoryview(self._PADDING)[:npad]
+        else:
+            packet += npad * b" "
+        packet += json_rpc_terminator
+        self._asyncio_transport.write(packet)
+        self._last_send = self.loop.time()
         del self._sbuffer[:p_idx]
+        self._sbuffer_base += p_idx
+        del self._sbuffer_frame_ends[:bisect.bisect_right(self._sbuffer_frame_ends, self._sbuffer_base)]
         if not self._sbuffer:
             self._sbuffer_has_data_evt.clear()
 
@@ -431,7 +526,7 @@ class PaddedRSTransport(RSTransport):
             #       but if busy, we might wake up to completely new buffer contents. Either is fine.
             if len(self._sbuffer) > 0:
                 timeout_abs = self._last_send + self.WAIT_FOR_BUFFER_GROWTH_SECONDS
-                timeout_rel = max(0.0, timeout_abs - time.monotonic())
+                timeout_rel = max(0.0, timeout_abs - self.loop.time())
                 await asyncio.sleep(timeout_rel)
 
     def connection_made(self, transport: asyncio.BaseTransport):
@@ -454,6 +549,8 @@ class PaddedRSTransport(RSTransport):
 
 class ServerAddr:
 
+    __slots__ = ('host', 'port', 'protocol', '_net_addr_str', '_str', '_hash')
+
     def __init__(self, host: str, port: Union[int, str], *, protocol: str = None):
         assert isinstance(host, str), repr(host)
         if protocol is None:
@@ -472,6 +569,9 @@ class ServerAddr:
         self.port = int(net_addr.port)
         self.protocol = protocol
         self._net_addr_str = str(net_addr)
+        # instances are immutable and often used as dict keys, so precompute these
+        self._str = '{}:{}'.format(self._net_addr_str, self.protocol)
+        self._hash = hash((self.host, self.port, self.protocol))
 
     @classmethod
     def from_str(cls, s: str) -> 'ServerAddr':
@@ -514,10 +614,10 @@ class ServerAddr:
         return str(self)
 
     def __str__(self):
-        return '{}:{}'.format(self.net_addr_str(), self.protocol)
+        return self._str
 
     def to_json(self) -> str:
-        return str(self)
+        return self._str
 
     def __repr__(self):
         return f'<ServerAddr host={self.host} port={self.port} protocol={self.protocol}>'
@@ -536,23 +636,60 @@ class ServerAddr:
         return not (self == other)
 
     def __hash__(self):
-        return hash((self.host, self.port, self.protocol))
+        return self._hash
 
 
 def _get_cert_path_for_host(*, config: 'SimpleConfig', host: str) -> str:
     filename = host
-    try:
-        ip = ip_address(host)
-    except ValueError:
-        pass
-    else:
-        if isinstance(ip, IPv6Address):
+    if ':' in host:  # only IPv6 addresses get a special filename
+        try:
+            ip = IPv6Address(host)
+        except ValueError:
+            pass
+        else:
             filename = f"ipv6_{ip.packed.hex()}"
     return os.path.join(config.path, 'certs', filename)
 
 
+# Parsed pinned certs keyed by (cert_path, mtime_ns, size), and the SSL contexts built from them
+# keyed by PEM, so that reconnecting to the same server does not re-parse an unchanged cert file.
+_pinned_cert_cache = LRUCache(maxsize=1000)  # type: LRUCache[Tuple[str, int, int], Tuple[str, bytes, x509.X509]]
+_pinned_ssl_context_cache = LRUCache(maxsize=1000)  # type: LRUCache[str, ssl.SSLContext]
+
+
+def _get_cert_file_cache_key(cert_path: str) -> Tuple[str, int, int]:
+    st = os.stat(cert_path)
+    return cert_path, st.st_mtime_ns, st.st_size
+
+
+# workaround android bug: make sure the PEM end marker is on its own line
+_CERT_END_FIXUP = re.compile("([^\n])-----END CERTIFICATE-----")
+
+
+@functools.lru_cache(maxsize=1000)
+def _get_bucket_for_ip_addr(ip_addr_str: Optional[str]) -> str:
+    try:
+        ip_addr = ip_address(ip_addr_str)  # type: Union[IPv4Address, IPv6Address]
+    except ValueError:
+        return ''
+    if not ip_addr:
+        return ''
+    if ip_addr.is_loopback:  # localhost is exempt
+        return ''
+    if ip_addr.version == 4:
+        slash16 = IPv4Network((int(ip_addr) & 0xFFFF_0000, 16))
+        return str(slash16)
+    elif ip_addr.version == 6:
+        slash48 = IPv6Network((int(ip_addr) & (((1 << 48) - 1) << 80), 48))
+        return str(slash48)
+    return ''
+
+
 class Interface(Logger):
 
+    # num of cached headers below the tip that are kept across tip changes
+    HEADERS_CACHE_KEEP_BELOW_TIP = 144
+
     def __init__(self, *, network: 'Network', server: ServerAddr):
         assert isinstance(server, ServerAddr), f"expected ServerAddr, got {type(server)}"
         self.ready = network.asyncio_loop.create_future()
@@ -585,8 +722,13 @@ class Interface(Logger):
         self.tip_header = None  # type: Optional[dict]
         self.tip = 0
 
-        self._headers_cache = {}  # type: Dict[int, bytes]
+        self._headers_cache = {}  # type: Dict[int, bytes]  # height->raw_header, as claimed by the server
+        # sorted, disjoint and non-adjacent [lo, hi] height ranges covered by _headers_cache
+        self._headers_cache_intervals = []  # type: List[Tuple[int, int]]
         self._rawtx_cache = LRUCache(maxsize=20)  # type: LRUCache[str, bytes]  # txid->rawtx
+        self._inflight_requests = {}  # type: Dict[Tuple[str, tuple], asyncio.Future]
+        # other servers that sent us a chunk of headers that did not connect. not used for chunks anymore.
+        self._bad_chunk_peers = set()  # type: Set[ServerAddr]
 
         self.fee_estimates_eta = {}  # type: Dict[int, int]
 
@@ -650,34 +792,46 @@ class Interface(Logger):
         else:
             await self._save_certificate()
 
-    def _is_saved_ssl_cert_available(self):
-        if not os.path.exists(self.cert_path):
-            return False
-        with open(self.cert_path, 'r') as f:
-            contents = f.read()
-        if contents == '':  # CA signed
+    def _read_saved_ssl_cert(self) -> Optional[str]:
+        """Returns the contents of the saved cert file for this server, if usable:
+        an empty str if the server is CA signed, or the PEM of the pinned self-signed cert.
+        Returns None if there is no saved cert (or it has expired).
+        """
+        try:
+            cache_key = _get_cert_file_cache_key(self.cert_path)
+        except FileNotFoundError:
+            return None
+        if cache_key[2] == 0:  # CA signed
             if self._get_expected_fingerprint():
                 raise InvalidOptionCombination("cannot use --serverfingerprint with CA signed servers")
-            return True
+            return ''
         # pinned self-signed cert
-        try:
-            b = pem.dePem(contents, 'CERTIFICATE')
-        except SyntaxError as e:
-            self.logger.info(f"error parsing already saved cert: {e}")
-            raise ErrorParsingSSLCert(e) from e
-        try:
-            x = x509.X509(b)
-        except Exception as e:
-            self.logger.info(f"error parsing already saved cert: {e}")
-            raise ErrorParsingSSLCert(e) from e
+        cached = _pinned_cert_cache.get(cache_key)
+        if cached is not None:
+            contents, b, x = cached
+        else:
+            with open(self.cert_path, 'r') as f:
+                contents = f.read()
+            try:
+                b = bytes(pem.dePem(contents, 'CERTIFICATE'))
+            except SyntaxError as e:
+                self.logger.info(f"error parsing already saved cert: {e}")
+                raise ErrorParsingSSLCert(e) from e
+            try:
+                x = x509.X509(b)
+            except Exception as e:
+                self.logger.info(f"error parsing already saved cert: {e}")
+                raise ErrorParsingSSLCert(e) from e
+            _pinned_cert_cache[cache_key] = contents, b, x
         try:
             x.check_date()
         except x509.CertificateError as e:
             self.logger.info(f"certificate has expired: {e}")
+            _pinned_cert_cache.pop(cache_key, None)
             os.unlink(self.cert_path)  # delete pinned cert only in this case
-            return False
-        self._verify_certificate_fingerprint(bytes(b))
-        return True
+            return None
+        self._verify_certificate_fingerprint(b)
+        return contents
 
     async def _get_ssl_context(self) -> Optional[ssl.SSLContext]:
         if self.protocol != 's':
@@ -685,24 +839,27 @@ class Interface(Logger):
             return None
 
         # see if we already have cert for this server; or get it for the first time
-        ca_sslc = ssl.create_default_context(purpose=ssl.Purpose.SERVER_AUTH, cafile=ca_path)
-        if not self._is_saved_ssl_cert_available():
+        ca_sslc = _get_ca_ssl_context()
+        saved_cert = self._read_saved_ssl_cert()
+        if saved_cert is None:
             try:
                 await self._try_saving_ssl_cert_for_first_time(ca_sslc)
             except (OSError, ConnectError, aiorpcx.socks.SOCKSError) as e:
                 raise ErrorGettingSSLCertFromServer(e) from e
-        # now we have a file saved in our certificate store
-        siz = os.stat(self.cert_path).st_size
-        if siz == 0:
+            # now we have a file saved in our certificate store
+            with open(self.cert_path, 'r') as f:
+                saved_cert = f.read()
+        if saved_cert == '':
             # CA signed cert
             sslc = ca_sslc
-        else:
+        elif (sslc := _pinned_ssl_context_cache.get(saved_cert)) is None:
             # pinned self-signed cert
-            sslc = ssl.create_default_context(purpose=ssl.Purpose.SERVER_AUTH, cafile=self.cert_path)
+            sslc = ssl.create_default_context(purpose=ssl.Purpose.SERVER_AUTH, cadata=saved_cert)
             # note: Flag "ssl.VERIFY_X509_STRICT" is enabled by default in python 3.13+ (disabled in older versions).
             #       We explicitly disable it as it breaks lots of servers.
             sslc.verify_flags &= ~ssl.VERIFY_X509_STRICT
             sslc.check_hostname = False
+            _pinned_ssl_context_cache[saved_cert] = sslc
         return sslc
 
     def handle_disconnect(func):
@@ -719,10 +876,22 @@ class Interface(Logger):
                 self.got_disconnected.set()
                 # Make sure taskgroup gets cleaned-up. This explicit clean-up is needed here
                 # in case the "with taskgroup" ctx mgr never got a chance to run:
-                await self.taskgroup.cancel_remaining()
+                # note: A child task that swallows its cancellation would make cancel_remaining() hang,
+                #       and if we get cancelled while waiting, connection_down would be skipped.
+                #       So bound the wait, and shield it, deferring our own cancellation until after cleanup.
+                cancelled = False
+                try:
+                    await asyncio.shield(util.wait_for2(
+                        self.taskgroup.cancel_remaining(), timeout=TASKGROUP_CANCEL_TIMEOUT_SECONDS))
+                except asyncio.TimeoutError:
+                    self.logger.warning("timed out waiting for interface tasks to get cancelled")
+                except asyncio.CancelledError:
+                    cancelled = True
                 await self.network.connection_down(self)
                 # if was not 'ready' yet, schedule waiting coroutines:
                 self.ready.cancel()
+                if cancelled:
+                    raise asyncio.CancelledError()
         return wrapper_func
 
     @ignore_exceptions  # do not kill network.taskgroup
@@ -777,8 +946,7 @@ class Interface(Logger):
                     self._verify_certificate_fingerprint(dercert)
                     with open(self.cert_path, 'w') as f:
                         cert = ssl.DER_cert_to_PEM_cert(dercert)
-                        # workaround android bug
-                        cert = re.sub("([^\n])-----END CERTIFICATE-----","\\1\n-----END CERTIFICATE-----",cert)
+                        cert = _CERT_END_FIXUP.sub("\\1\n-----END CERTIFICATE-----", cert)
                         f.write(cert)
                         # even though close flushes, we can't fsync when closed.
                         # and we must flush before fsyncing, cause flush flushes to OS buffer
@@ -825,16 +993,77 @@ class Interface(Logger):
         """Populate header cache for block heights in range [from_height, to_height]."""
         assert from_height <= to_height, (from_height, to_height)
         assert to_height - from_height < MAX_NUM_HEADERS_PER_REQUEST
-        if all(height in self._headers_cache for height in range(from_height, to_height+1)):
+        if self._is_headers_cache_covering(from_height, to_height):
             # cache already has all requested headers
             return
         # use lower timeout as we usually have network.bhi_lock here
         timeout = self.network.get_network_timeout_seconds(NetworkTimeout.Urgent)
         count = to_height - from_height + 1
         headers = await self.get_block_headers(start_height=from_height, count=count, timeout=timeout, mode=mode)
+        self._add_to_headers_cache(from_height, headers)
+
+    async def _maybe_warm_headers_cache_at_heights(self, heights: Sequence[int], *, mode: ChainResolutionMode) -> None:
+        """Populate header cache for the given (not necessarily consecutive) block heights,
+        requesting the missing ones concurrently.
+        """
+        heights = sorted(set(height for height in heights if height not in self._headers_cache))
+        if not heights:
+            return
+        self.logger.info(f"requesting block headers {heights} in {mode=}")
+        # use lower timeout as we usually have network.bhi_lock here
+        timeout = self.network.get_network_timeout_seconds(NetworkTimeout.Urgent)
+
+        async def fetch_header(height: int) -> None:
+            res = await self._send_request_coalesced('blockchain.block.header', [height], timeout=timeout)
+            raw_header = assert_hex_str_and_decode(res)
+            if len(raw_header) != HEADER_SIZE:
+                raise RequestCorrupted(f"invalid header size. got {len(raw_header)}, expected {HEADER_SIZE}")
+            self._add_to_headers_cache(height, [raw_header])
+
+        async with OldTaskGroup() as group:
+            for height in heights:
+                await group.spawn(fetch_header(height))
+
+    def _add_to_headers_cache(self, from_height: int, headers: Sequence[bytes]) -> None:
+        if not headers:
+            return
         for idx, raw_header in enumerate(headers):
-            header_height = from_height + idx
-            self._headers_cache[header_height] = raw_header
+            self._headers_cache[from_height + idx] = raw_header
+        # update intervals: merge [lo, hi] with all intervals it overlaps or touches
+        lo, hi = from_height, from_height + len(headers) - 1
+        intervals = self._headers_cache_intervals
+        i = bisect.bisect_left(intervals, (lo, lo))
+        if i > 0 and intervals[i-1][1] >= lo - 1:
+            i -= 1
+            lo = intervals[i][0]
+        j = i
+        while j < len(intervals) and intervals[j][0] <= hi + 1:
+            hi = max(hi, intervals[j][1])
+            j += 1
+        intervals[i:j] = [(lo, hi)]
+
+    def _is_headers_cache_covering(self, from_height: int, to_height: int) -> bool:
+        """Returns whether the headers cache has all headers in range [from_height, to_height]."""
+        intervals = self._headers_cache_intervals
+        i = bisect.bisect_right(intervals, (from_height, float("inf"))) - 1
+        return i >= 0 and intervals[i][1] >= to_height
+
+    async def _send_request_coalesced(self, method: str, params: list, *, timeout=None) -> Any:
+        """Like session.send_request, but concurrent identical requests share a single RPC call."""
+        key = self.session.get_hashable_key_for_rpc_call(method, params)
+        if (fut := self._inflight_requests.get(key)) is None:
+            # The shared request runs in its own task, not owned by any of the callers,
+            # so that a caller getting cancelled does not cancel the request for the others.
+            fut = asyncio.get_running_loop().create_task(
+                self.session.send_request(method, params, timeout=timeout))
+            self._inflight_requests[key] = fut
+
+            def on_done(fut_: asyncio.Future) -> None:
+                del self._inflight_requests[key]
+                if not fut_.cancelled():
+                    fut_.exception()  # mark as retrieved, in case all callers were cancelled
+            fut.add_done_callback(on_done)
+        return await asyncio.shield(fut)
 
     async def get_block_header(self, height: int, *, mode: ChainResolutionMode) -> dict:
         if not is_non_negative_integer(height):
@@ -845,7 +1074,7 @@ class Interface(Logger):
         if raw_header := self._headers_cache.get(height):
             return blockchain.deserialize_header(raw_header, height)
         self.logger.info(f'requesting block header {height} in {mode=}')
-        res = await self.session.send_request('blockchain.block.header', [height], timeout=timeout)
+        res = await self._send_request_coalesced('blockchain.block.header', [height], timeout=timeout)
         return blockchain.deserialize_header(bytes.fromhex(res), height)
 
     async def get_block_headers(
@@ -861,6 +1090,21 @@ class Interface(Logger):
         (if range would extend beyond its tip).
         note: the returned headers are not verified or parsed at all.
         """
+        raw_headers = await self.get_block_headers_concatenated(
+            start_height=start_height, count=count, timeout=timeout, mode=mode)
+        return [raw_headers[i:i+HEADER_SIZE] for i in range(0, len(raw_headers), HEADER_SIZE)]
+
+    async def get_block_headers_concatenated(
+        self,
+        *,
+        start_height: int,
+        count: int,
+        timeout=None,
+        mode: Optional[ChainResolutionMode] = None,
+    ) -> bytes:
+        """Same as get_block_headers, but returns the headers concatenated, as a single bytes object.
+        This is the form connect_chunk wants, and it avoids splitting and re-joining them.
+        """
         if not is_non_negative_integer(start_height):
             raise Exception(f"{repr(start_height)} is not a block height")
         if not is_non_negative_integer(count) or not (0 < count <= MAX_NUM_HEADERS_PER_REQUEST):
@@ -869,7 +1113,7 @@ class Interface(Logger):
             f"requesting block headers: [{start_height}, {start_height+count-1}], {count=}"
             + (f" (in {mode=})" if mode is not None else "")
         )
-        res = await self.session.send_request('blockchain.block.headers', [start_height, count], timeout=timeout)
+        res = await self._send_request_coalesced('blockchain.block.headers', [start_height, count], timeout=timeout)
         # check response
         assert_dict_contains_field(res, field_name='count')
         assert_dict_contains_field(res, field_name='max')
@@ -879,18 +1123,24 @@ class Interface(Logger):
             hex_headers_list = assert_dict_contains_field(res, field_name='headers')
             assert_list_or_tuple(hex_headers_list)
             for item in hex_headers_list:
-                assert_hex_str(item)
+                if not isinstance(item, str):
+                    raise RequestCorrupted(f'{item!r} should be a hex str')
                 if len(item) != HEADER_SIZE * 2:
                     raise RequestCorrupted(f"invalid header size. got {len(item)//2}, expected {HEADER_SIZE}")
             if len(hex_headers_list) != res['count']:
                 raise RequestCorrupted(f"{len(hex_headers_list)=} != {res['count']=}")
-            headers = list(bfh(hex_header) for hex_header in hex_headers_list)
+            # as all items have the right length, it is enough to validate the concatenation
+            try:
+                raw_headers = bytes.fromhex("".join(hex_headers_list))
+            except ValueError:
+                raise RequestCorrupted("headers should be hex strs") from None
+            if len(raw_headers) != HEADER_SIZE * res['count']:  # whitespaces
+                raise RequestCorrupted("headers should be hex strs")
         else: # proto 1.4
             hex_headers_concat = assert_dict_contains_field(res, field_name='hex')
-            assert_hex_str(hex_headers_concat)
-            if len(hex_headers_concat) != HEADER_SIZE * 2 * res['count']:
+            raw_headers = assert_hex_str_and_decode(hex_headers_concat)
+            if len(raw_headers) != HEADER_SIZE * res['count']:
                 raise RequestCorrupted('inconsistent chunk hex and count')
-            headers = list(util.chunks(bfh(hex_headers_concat), size=HEADER_SIZE))
         # we never request more than MAX_NUM_HEADERS_IN_REQUEST headers, but we enforce those fit in a single response
         if res['max'] < MAX_NUM_HEADERS_PER_REQUEST:
             raise RequestCorrupted(f"server uses too low 'max' count for block.headers: {res['max']} < {MAX_NUM_HEADERS_PER_REQUEST}")
@@ -903,7 +1153,7 @@ class Interface(Logger):
                 raise RequestCorrupted(
                     f"asked for {count} headers but got fewer: {res['count']}. ({start_height=}, {self.tip=})")
         # checks done.
-        return headers
+        return raw_headers
 
     async def request_chunk_below_max_checkpoint(
         self,
@@ -919,10 +1169,10 @@ class Interface(Logger):
         self.logger.debug(f"requesting chunk from height {height}")
         try:
             self._requested_chunks.add(index)
-            headers = await self.get_block_headers(start_height=index * CHUNK_SIZE, count=CHUNK_SIZE)
+            raw_headers = await self.get_block_headers_concatenated(start_height=index * CHUNK_SIZE, count=CHUNK_SIZE)
         finally:
             self._requested_chunks.discard(index)
-        conn = self.blockchain.connect_chunk(index, data=b"".join(headers))
+        conn = self.blockchain.connect_chunk(index, data=raw_headers)
         if not conn:
             raise RequestCorrupted(f"chunk ({index=}, for {height=}) does not connect to blockchain")
         return None
@@ -949,8 +1199,10 @@ class Interface(Logger):
         # - more chunks: higher memory requirements
         # - more chunks: higher concurrency => syncing needs fewer network round-trips
         # - if a chunk does not connect, bandwidth for all later chunks is wasted
+        # The chunks are spread over all servers that agree with ours on the tip, to spread the load.
+        peers = self._get_peers_for_chunk_download()
         async with OldTaskGroup() as group:
-            tasks = []  # type: List[Tuple[int, asyncio.Task[Sequence[bytes]]]]
+            tasks = []  # type: List[Tuple[int, int, asyncio.Task[Tuple[bytes, Interface]]]]
             index0 = height // CHUNK_SIZE
             for chunk_cnt in range(10):
                 index = index0 + chunk_cnt
@@ -959,19 +1211,78 @@ class Interface(Logger):
                     break
                 end_height = min(start_height + CHUNK_SIZE - 1, tip)
                 size = end_height - start_height + 1
-                tasks.append((index, await group.spawn(self.get_block_headers(start_height=start_height, count=size))))
-        # try to connect chunks
-        num_headers = 0
-        for index, task in tasks:
-            headers = task.result()
-            conn = self.blockchain.connect_chunk(index, data=b"".join(headers))
-            if not conn:
-                break
-            num_headers += len(headers)
+                peer = peers[chunk_cnt % len(peers)]
+                tasks.append((index, size, await group.spawn(
+                    self._get_block_headers_from_peer(peer, start_height=start_height, count=size))))
+            # try to connect chunks, in order, each as soon as it arrives (while later ones are still downloading)
+            num_headers = 0
+            for index, size, task in tasks:
+                raw_headers, source = await task
+                if source is not self and source.server in self._bad_chunk_peers:
+                    # an earlier chunk from this peer did not connect, don't trust this one either
+                    raw_headers = await self.get_block_headers_concatenated(start_height=index * CHUNK_SIZE, count=size)
+                    source = self
+                conn = self.blockchain.connect_chunk(index, data=raw_headers)
+                if not conn and source is not self:
+                    self.logger.info(f"chunk {index} from {source.server} does not connect. "
+                                     f"not using that server for chunks anymore")
+                    self._bad_chunk_peers.add(source.server)
+                    raw_headers = await self.get_block_headers_concatenated(
+                        start_height=index * CHUNK_SIZE, count=size)
+                    conn = self.blockchain.connect_chunk(index, data=raw_headers)
+                if not conn:
+                    await group.cancel_remaining()  # later chunks are useless now
+                    break
+                num_headers += len(raw_headers) // HEADER_SIZE
         # We started at a chunk boundary, instead of requested `height`. Need to correct for that.
         offset = height - index0 * CHUNK_SIZE
         return max(0, num_headers - offset)
 
+    def _get_peers_for_chunk_download(self) -> Sequence['Interface']:
+        """Returns this interface, followed by the other ready interfaces whose server has the same tip.
+        A server with the same tip header is on the same chain, so it can serve the same headers.
+        """
+        with self.network.interfaces_lock: interfaces = list(self.network.interfaces.values())
+        peers = [iface for iface in interfaces
+                 if iface is not self and iface.tip_header == self.tip_header and iface.is_connected_and_ready()
+                 and iface.server not in self._bad_chunk_peers]
+        random.shuffle(peers)
+        return [self] + peers
+
+    async def _get_block_headers_from_peer(
+        self,
+        peer: 'Interface',
+        *,
+        start_height: int,
+        count: int,
+    ) -> Tuple[bytes, 'Interface']:
+        """Request headers using another interface, falling back to our own server if that fails.
+        Returns the headers, and the interface that served them.
+        The request runs in the taskgroup of `peer`, so that it gets cancelled if that interface is closed.
+        Errors are caught inside the task: a request made for our sync must not take down the other interface.
+        """
+        if peer is not self:
+            async def get_headers() -> Optional[bytes]:
+                try:
+                    return await peer.get_block_headers_concatenated(start_height=start_height, count=count)
+                except Exception as e:
+                    self.logger.info(f"failed to get headers from {peer.server}: {e!r}")
+                    return None
+
+            task = None
+            if not peer.taskgroup.joined:  # otherwise peer is shutting down
+                task = await peer.taskgroup.spawn(get_headers())
+            if task is not None:
+                try:
+                    await asyncio.wait([task])
+                except asyncio.CancelledError:
+                    task.cancel()
+                    raise
+                if not task.cancelled() and (raw_headers := task.result()) is not None:
+                    return raw_headers, peer
+            self.logger.info(f"requesting headers from our own server instead of {peer.server}")
+        return await self.get_block_headers_concatenated(start_height=start_height, count=count), self
+
     def is_main_server(self) -> bool:
         return (self.network.interface == self or
                 self.network.interface is None and self.network.default_server == self.server)
@@ -982,7 +1293,7 @@ class Interface(Logger):
         ssl_context: Optional[ssl.SSLContext],
         exit_early: bool = False,
     ):
-        session_factory = lambda *args, iface=self, **kwargs: NotificationSession(*args, **kwargs, interface=iface)
+        session_factory = functools.partial(NotificationSession, interface=self)
         async with _RSClient(
             session_factory=session_factory,
             host=self.host, port=self.port,
@@ -1059,12 +1370,21 @@ class Interface(Logger):
         while True:
             await asyncio.sleep(random.random() * 300)
             await self.session.send_request('server.ping')
-            await self._maybe_send_noise()
+            if self._should_send_noise():
+                await self._send_noise()
+
+    @staticmethod
+    def _should_send_noise() -> bool:
+        return random.random() < 0.2
 
-    async def _maybe_send_noise(self):
-        while random.random() < 0.2:
+    async def _send_noise(self):
+        # the first coin flip is done by the caller (see _should_send_noise),
+        # so that no task needs to be created in the common case of not sending anything
+        while True:
             await asyncio.sleep(random.random())
             await self.session.send_request('server.ping')
+            if not self._should_send_noise():
+                break
 
     async def request_fee_estimates(self):
         while True:
@@ -1103,12 +1423,12 @@ class Interface(Logger):
                 raise GracefulDisconnect(
                     f"server tip below max checkpoint. ({self.tip} < {constants.net.max_checkpoint()})")
             self._mark_ready()
-            self._headers_cache.clear()  # tip changed, so assume anything could have happened with chain
-            self._headers_cache[height] = header_bytes
+            self._add_to_headers_cache(height, [header_bytes])
+            self._prune_headers_cache()  # tip changed, the server might have reorged
             try:
                 blockchain_updated = await self._process_header_at_tip()
             finally:
-                self._headers_cache.clear()  # to reduce memory usage
+                self._prune_headers_cache()  # to reduce memory usage
             # header processing done
             if self.is_main_server() or blockchain_updated:
                 self.logger.info(f"new chain tip. {height=}")
@@ -1119,7 +1439,27 @@ class Interface(Logger):
             util.trigger_callback('network_updated')
             await self.network.switch_unwanted_fork_interface()
             await self.network.switch_lagging_interface()
-            await self.taskgroup.spawn(self._maybe_send_noise())
+            if self._should_send_noise():
+                await self.taskgroup.spawn(self._send_noise())
+
+    def _prune_headers_cache(self) -> None:
+        """Only keep the cached headers that are still part of the server's chain, i.e. the ancestors
+        of the tip, going back at most HEADERS_CACHE_KEEP_BELOW_TIP. Anything else might be stale due to a reorg.
+        """
+        cache = self._headers_cache
+        kept = {}
+        height = self.tip
+        raw_header = cache.get(height)
+        if raw_header is not None:
+            kept[height] = raw_header
+            while height > 0 and len(kept) <= self.HEADERS_CACHE_KEEP_BELOW_TIP:
+                prev_header = cache.get(height - 1)
+                if prev_header is None or sha256d(prev_header) != raw_header[4:36]:  # prev_block_hash
+                    break
+                height, raw_header = height - 1, prev_header
+                kept[height] = raw_header
+        self._headers_cache = kept
+        self._headers_cache_intervals = [(height, self.tip)] if kept else []
 
     async def _process_header_at_tip(self) -> bool:
         """Returns:
@@ -1227,6 +1567,14 @@ class Interface(Logger):
             if bad - good + 1 <= MAX_NUM_HEADERS_PER_REQUEST:  # if interval is small, trade some bandwidth for lower latency
                 await self._maybe_warm_headers_cache(
                     from_height=good, to_height=bad, mode=ChainResolutionMode.BINARY)
+            elif height not in self._headers_cache:
+                # The next midpoints depend on the outcome of this step. As we need a round-trip for the
+                # current one anyway, speculatively fetch all candidates for the next few steps concurrently.
+                # This fetches up to 2**BINARY_SEARCH_PREFETCH_DEPTH - 1 headers instead of one,
+                # but the next BINARY_SEARCH_PREFETCH_DEPTH - 1 steps are then served from the cache.
+                await self._maybe_warm_headers_cache_at_heights(
+                    _get_binary_search_probe_heights(good, bad, depth=BINARY_SEARCH_PREFETCH_DEPTH),
+                    mode=ChainResolutionMode.BINARY)
             header = await self.get_block_header(height, mode=ChainResolutionMode.BINARY)
             chain = blockchain.check_header(header)
             if chain:
@@ -1304,7 +1652,15 @@ class Interface(Logger):
             from_height=max(0, height-10), to_height=height, mode=ChainResolutionMode.BACKWARD)
 
         delta = 2
-        while await iterate():
+        while True:
+            # The probed heights do not depend on the headers we get, so we know them in advance.
+            # Whenever the next probe is not cached yet, fetch a few upcoming ones concurrently.
+            cp = constants.net.max_checkpoint()
+            if max(cp, height) not in self._headers_cache:
+                probe_heights = [max(cp, height - (2 ** k - 1) * delta) for k in range(4)]
+                await self._maybe_warm_headers_cache_at_heights(probe_heights, mode=ChainResolutionMode.BACKWARD)
+            if not await iterate():
+                break
             bad, bad_header = height, header
             height -= delta
             delta *= 2
@@ -1331,21 +1687,8 @@ class Interface(Logger):
         def do_bucket():
             if self.is_tor():
                 return BUCKET_NAME_OF_ONION_SERVERS
-            try:
-                ip_addr = ip_address(self.ip_addr())  # type: Union[IPv4Address, IPv6Address]
-            except ValueError:
-                return ''
-            if not ip_addr:
-                return ''
-            if ip_addr.is_loopback:  # localhost is exempt
-                return ''
-            if ip_addr.version == 4:
-                slash16 = IPv4Network(ip_addr).supernet(prefixlen_diff=32-16)
-                return str(slash16)
-            elif ip_addr.version == 6:
-                slash48 = IPv6Network(ip_addr).supernet(prefixlen_diff=128-48)
-                return str(slash48)
-            return ''
+            # note: the bucket of an address never changes, so it is shared across interfaces (reconnects)
+            return _get_bucket_for_ip_addr(self.ip_addr())
 
         if not self._ipaddr_bucket:
             self._ipaddr_bucket = do_bucket()
@@ -1365,9 +1708,7 @@ class Interface(Logger):
         # note: tx_height was just a hint to the server, don't enforce the response to match it
         assert_non_negative_integer(block_height)
         assert_non_negative_integer(pos)
-        assert_list_or_tuple(merkle)
-        for item in merkle:
-            assert_hash256_str(item)
+        assert_list_of_hash256_str(merkle)
         return res
 
     async def get_transaction(self, tx_hash: str, *, timeout=None) -> str:
@@ -1455,17 +1796,26 @@ class Interface(Logger):
         # check response
         assert_list_or_tuple(res)
         prev_height = 1
+        hashes = set()
+        mempool_txs = []
         for tx_item in res:
             height = assert_dict_contains_field(tx_item, field_name='height')
-            assert_dict_contains_field(tx_item, field_name='tx_hash')
+            tx_hash = assert_dict_contains_field(tx_item, field_name='tx_hash')
             assert_integer(height)
             if height < -1:
                 raise RequestCorrupted(f'{height!r} is not a valid block height')
-            assert_hash256_str(tx_item['tx_hash'])
+            assert_hash256_str(tx_hash)
+            if tx_hash in hashes:
+                # Either server is sending garbage... or maybe if server is race-prone
+                # a recently mined tx could be included in both last block and mempool?
+                # Still, it's simplest to just disregard the response.
+                raise RequestCorrupted(f"server history has non-unique txids for sh={sh}")
+            hashes.add(tx_hash)
             if height in (-1, 0):
                 assert_dict_contains_field(tx_item, field_name='fee')
                 assert_non_negative_integer(tx_item['fee'])
                 prev_height = float("inf")  # this ensures confirmed txs can't follow mempool txs
+                mempool_txs.append(tx_item)
             else:
                 # check monotonicity of heights
                 if height < prev_height:
@@ -1473,15 +1823,8 @@ class Interface(Logger):
                 prev_height = height
         if self.active_protocol_tuple >= (1, 6):
             # enforce order of mempool txs
-            mempool_txs = [tx_item for tx_item in res if tx_item['height'] <= 0]
             if mempool_txs != sorted(mempool_txs, key=lambda x: (-x['height'], bytes.fromhex(x['tx_hash']))):
                 raise RequestCorrupted(f'mempool txs not in canonical order')
-        hashes = set(map(lambda item: item['tx_hash'], res))
-        if len(hashes) != len(res):
-            # Either server is sending garbage... or maybe if server is race-prone
-            # a recently mined tx could be included in both last block and mempool?
-            # Still, it's simplest to just disregard the response.
-            raise RequestCorrupted(f"server history has non-unique txids for sh={sh}")
         return res
 
     async def listunspent_for_scripthash(self, sh: str) -> List[dict]:
@@ -1526,12 +1869,10 @@ class Interface(Logger):
         )
         # check response
         if merkle:
-            assert_dict_contains_field(res, field_name='tx_hash')
-            assert_dict_contains_field(res, field_name='merkle')
-            assert_hash256_str(res['tx_hash'])
-            assert_list_or_tuple(res['merkle'])
-            for node_hash in res['merkle']:
-                assert_hash256_str(node_hash)
+            tx_hash = assert_dict_contains_field(res, field_name='tx_hash')
+            merkle_branch = assert_dict_contains_field(res, field_name='merkle')
+            assert_hash256_str(tx_hash)
+            assert_list_of_hash256_str(merkle_branch)
         else:
             assert_hash256_str(res)
         return res
@@ -1584,7 +1925,7 @@ class Interface(Logger):
             minrelaytxfee = await self.session.send_request('blockchain.relayfee')
         # check response
         assert_non_negative_int_or_float(minrelaytxfee)
-        relayfee = int(minrelaytxfee * bitcoin.COIN)
+        relayfee = round(minrelaytxfee * bitcoin.COIN)  # note: int() would truncate e.g. 2.9e-07 BTC to 28 sat
         relayfee = max(0, relayfee)
         return relayfee
 
@@ -1617,10 +1958,26 @@ class Interface(Logger):
         # check response
         if res != -1:
             assert_non_negative_int_or_float(res)
-            res = int(res * bitcoin.COIN)
+            res = round(res * bitcoin.COIN)
         return res
 
 
+def _get_binary_search_probe_heights(good: int, bad: int, *, depth: int) -> List[int]:
+    """Returns the heights a binary search over ]good, bad[ might probe in its next `depth` steps."""
+    heights = []
+    intervals = [(good, bad)]
+    for _level in range(depth):
+        next_intervals = []
+        for lo, hi in intervals:
+            if lo + 1 >= hi:
+                continue
+            mid = (lo + hi) // 2
+            heights.append(mid)
+            next_intervals += [(lo, mid), (mid, hi)]
+        intervals = next_intervals
+    return heights
+
+
 def _assert_header_does_not_check_against_any_chain(header: dict) -> None:
     chain_bad = blockchain.check_header(header)
     if chain_bad:
@@ -135,7 +135,8 @@ class JsonDB(Logger):
             # apply patches
             self.logger.info('found %d patches'%len(patches))
             patch = jsonpatch.JsonPatch(patches)
-            data = patch.apply(data)
+            # data was just parsed and is not referenced elsewhere, no need for a deepcopy
+            data = patch.apply(data, in_place=True)
             self.set_modified(True)
         return data
 
@@ -23,6 +23,7 @@
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import hashlib
 import json
 import os
 import pkgutil
@@ -52,7 +53,6 @@ from . import bip32
 from . import plugins
 from .simple_config import SimpleConfig
 from .logging import get_logger, Logger
-from .crypto import sha256
 from .network import Network
 
 if TYPE_CHECKING:
@@ -70,6 +70,13 @@ _exec_module_failure = {}  # type: Dict[str, Exception]
 PLUGIN_PASSWORD_VERSION = 1
 
 
+class PluginStatus(NamedTuple):
+    internal: bool
+    enabled: bool
+    can_user_disable: bool
+    requires_settings: bool
+
+
 class Plugins(DaemonThread):
 
     pkgpath = os.path.dirname(plugins.__file__)
@@ -83,6 +90,8 @@ class Plugins(DaemonThread):
         self.cmd_only = cmd_only  # type: bool
         self.internal_plugin_metadata = {}
         self.external_plugin_metadata = {}
+        self._manifest_cache = None  # type: Optional[Dict[str, dict]]
+        self._manifest_cache_dirty = False  # whether _manifest_cache has unsaved changes
         if cmd_only:
             # only import the command modules of plugins
             Logger.__init__(self)
@@ -521,6 +530,67 @@ class Plugins(DaemonThread):
                 manifest['zip_hash_sha256'] = get_file_hash256(path).hex()
                 return manifest
 
+    def _manifest_cache_path(self) -> str:
+        return os.path.join(self.config.electrum_path(), 'plugins_meta.json')
+
+    def _get_manifest_cache(self) -> Dict[str, dict]:
+        if self._manifest_cache is None:
+            self._manifest_cache = {}
+            try:
+                with open(self._manifest_cache_path(), 'r', encoding='utf-8') as f:
+                    cache = json.load(f)
+            except FileNotFoundError:
+                return self._manifest_cache
+            except Exception as e:
+                self.logger.info(f"could not read plugin manifest cache: {e!r}")
+                return self._manifest_cache
+            if not isinstance(cache, dict):
+                self.logger.info("ignoring malformed plugin manifest cache")
+                return self._manifest_cache
+            # skip malformed entries (e.g. written by another version), they get re-read from the zip
+            self._manifest_cache = {
+                path: entry for path, entry in cache.items()
+                if isinstance(entry, dict)
+                and isinstance(entry.get('mtime_ns'), int)
+                and isinstance(entry.get('size'), int)
+                and isinstance(entry.get('manifest'), dict)
+            }
+        return self._manifest_cache
+
+    def _save_manifest_cache(self) -> None:
+        path = self._manifest_cache_path()
+        temp_path = f"{path}.tmp.{os.getpid()}"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._get_manifest_cache(), f, indent=4, sort_keys=True)
+            os.replace(temp_path, path)
+            self._manifest_cache_dirty = False
+        except OSError as e:
+            self.logger.info(f"could not write plugin manifest cache: {e!r}")
+
+    def read_manifest_cached(self, path: str, *, save_cache: bool = True) -> dict:
+        """Like read_manifest, but skips reading and hashing the zip file
+        if it has not changed (same mtime and size) since it was last read.
+        If save_cache is False, the caller is responsible for calling _save_manifest_cache.
+        """
+        st = os.stat(path)
+        cache = self._get_manifest_cache()
+        entry = cache.get(path)
+        if entry is not None and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            return dict(entry['manifest'])
+        # not cached, or changed
+        manifest = self.read_manifest(path)
+        cache[path] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'manifest': dict(manifest)}
+        if save_cache:
+            self._save_manifest_cache()
+        else:
+            self._manifest_cache_dirty = True
+        return manifest
+
+    def forget_cached_manifest(self, path: str) -> None:
+        if self._get_manifest_cache().pop(path, None) is not None:
+            self._save_manifest_cache()
+
     def zip_plugin_path(self, name) -> str:
         path = self.get_metadata(name)['path']
         filename = os.path.basename(path)
@@ -534,12 +604,27 @@ class Plugins(DaemonThread):
         """Finds plugins in zip form in the given pkg_path and populates the metadata dicts"""
         if pkg_path is None:
             return
+        try:
+            self._find_zip_plugins(pkg_path, external)
+        finally:
+            self._save_manifest_cache_after_scan()
+
+    def _save_manifest_cache_after_scan(self) -> None:
+        """Prunes cache entries for zips that no longer exist, and writes the cache once."""
+        cache = self._get_manifest_cache()
+        stale = [path for path in cache if not os.path.exists(path)]
+        for path in stale:
+            del cache[path]
+        if stale or self._manifest_cache_dirty:
+            self._save_manifest_cache()
+
+    def _find_zip_plugins(self, pkg_path: str, external: bool):
         for filename in os.listdir(pkg_path):
             path = os.path.join(pkg_path, filename)
             if not filename.endswith('.zip'):
                 continue
             try:
-                d = self.read_manifest(path)
+                d = self.read_manifest_cached(path, save_cache=False)
                 name = d['name']
             except Exception:
                 self.logger.info(f"could not load manifest.json from zip plugin {filename}", exc_info=True)
@@ -651,6 +736,7 @@ class Plugins(DaemonThread):
         if name in self.external_plugin_metadata:
             zipfile = self.zip_plugin_path(name)
             os.unlink(zipfile)
+            self.forget_cached_manifest(zipfile)
             self.external_plugin_metadata.pop(name)
 
     def is_internal(self, name) -> bool:
@@ -667,6 +753,35 @@ class Plugins(DaemonThread):
         """an external plugin may be installed but not authorized """
         return (name in self.internal_plugin_metadata or name in self.external_plugin_metadata)
 
+    def get_visible_names(self) -> List[str]:
+        """Returns the sorted names of the plugins that are shown to the user.
+        Internal plugins that are loaded automatically (e.g. hardware wallets) are hidden.
+        """
+        # external metadata takes precedence, as in self.descriptions
+        return sorted(
+            name for name, metadata in self.descriptions.items()
+            if metadata.get('fullname')
+            and not (name in self.internal_plugin_metadata
+                     and (metadata.get('registers_keystore') or metadata.get('registers_wallet_type')))
+        )
+
+    def get_status(self, name: str) -> PluginStatus:
+        """note: authorization is not included, as it requires hashing the zip file."""
+        p = self.plugins.get(name)
+        return PluginStatus(
+            internal=name in self.internal_plugin_metadata,
+            enabled=p is not None and p.is_enabled(),
+            can_user_disable=p is None or p.can_user_disable(),
+            requires_settings=p is not None and p.requires_settings(),
+        )
+
+    def status_snapshot(self) -> Dict[str, PluginStatus]:
+        """Returns the status of all installed plugins, computed in a single pass."""
+        return {
+            name: self.get_status(name)
+            for name in chain(self.internal_plugin_metadata, self.external_plugin_metadata)
+        }
+
     def is_authorized(self, name) -> bool:
         if name in self.internal_plugin_metadata:
             return True
@@ -816,7 +931,12 @@ class Plugins(DaemonThread):
 def get_file_hash256(path: str) -> bytes:
     """Get the sha256 hash of a file, similar to `sha256sum`."""
     with open(path, 'rb') as f:
-        return sha256(f.read())
+        if hasattr(hashlib, 'file_digest'):  # python 3.11+
+            return hashlib.file_digest(f, 'sha256').digest()
+        h = hashlib.sha256()
+        while chunk := f.read(1 << 20):
+            h.update(chunk)
+        return h.digest()
 
 
 def hook(func):
@@ -1,8 +1,9 @@
 import asyncio
 from functools import partial
+from types import SimpleNamespace
 
 import aiorpcx
-from aiorpcx import RPCError
+from aiorpcx import RPCError, NewlineFramer
 
 from electrum.bitcoin import COIN, COINBASE_MATURITY
 from electrum.interface import ServerAddr, Interface, PaddedRSTransport
@@ -64,6 +65,55 @@ class TestServerAddr(ElectrumTestCase):
                          ServerAddr(host="2400:6180:0:d1::86b:e001", port=50001, protocol="t").to_friendly_name())
 
 
+class MockAsyncioTransport:
+
+    def __init__(self):
+        self.packets = []
+
+    def write(self, data):
+        self.packets.append(bytes(data))
+
+    def is_closing(self):
+        return False
+
+
+class TestPaddedRSTransport(ElectrumTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.transport = PaddedRSTransport(None, NewlineFramer(), 'client')
+        self.transport._asyncio_transport = MockAsyncioTransport()
+        self.transport.session = SimpleNamespace(send_size=10**6)  # warmup budget used up
+
+    async def test_small_messages_are_buffered_then_padded(self):
+        await self.transport.write(b'{"id": 1}')
+        await self.transport.write(b'{"id": 2}')
+        self.assertEqual([], self.transport._asyncio_transport.packets)
+        self.transport._force_send = True
+        self.transport._maybe_consume_sbuffer()
+        packets = self.transport._asyncio_transport.packets
+        self.assertEqual(1, len(packets))
+        self.assertEqual(PaddedRSTransport.MIN_PACKET_SIZE, len(packets[0]))
+        self.assertEqual(b'{"id": 1}\n{"id": 2' + (PaddedRSTransport.MIN_PACKET_SIZE - 20) * b" " + b'}\n', packets[0])
+        self.assertEqual(b"", bytes(self.transport._sbuffer))
+
+    async def test_large_buffer_sends_small_packet_and_defers_rest(self):
+        msg1 = b'{"a": "' + 1500 * b"x" + b'"}'
+        msg2 = b'{"b": "' + 700 * b"y" + b'"}'
+        await self.transport.write(msg1)
+        await self.transport.write(msg2)
+        # writes within the same event loop iteration are coalesced
+        self.assertEqual([], self.transport._asyncio_transport.packets)
+        await asyncio.sleep(0)
+        # lsize would be 4096 bytes, ssize (2048 bytes) fits only the first message
+        packets = self.transport._asyncio_transport.packets
+        self.assertEqual(1, len(packets))
+        self.assertEqual(2048, len(packets[0]))
+        self.assertEqual(msg1[:-1], packets[0][:len(msg1)-1])
+        self.assertEqual(b'}\n', packets[0][-2:])
+        self.assertEqual(msg2 + b"\n", bytes(self.transport._sbuffer))
+
+
 class MockNetwork:
 
     def __init__(self, *, config: SimpleConfig):
@@ -141,6 +191,54 @@ class TestInterface(ElectrumTestCase):
         self.assertEqual(self._toyserver.cur_height, interface.tip)
         self.assertFalse(interface.got_disconnected.is_set())
 
+    async def test_concurrent_identical_header_requests_are_coalesced(self):
+        interface = await self._start_iface_and_wait_for_sync()
+        num_calls = self._get_server_session()._method_counts["blockchain.block.headers"]
+        res1, res2 = await asyncio.gather(
+            interface.get_block_headers(start_height=1, count=5),
+            interface.get_block_headers(start_height=1, count=5),
+        )
+        self.assertEqual(5, len(res1))
+        self.assertEqual(res1, res2)
+        self.assertEqual(num_calls + 1, self._get_server_session()._method_counts["blockchain.block.headers"])
+        # sequential requests are not coalesced
+        await interface.get_block_headers(start_height=1, count=5)
+        self.assertEqual(num_calls + 2, self._get_server_session()._method_counts["blockchain.block.headers"])
+
+    async def test_coalesced_request_survives_cancellation_of_first_caller(self):
+        interface = await self._start_iface_and_wait_for_sync()
+        num_calls = self._get_server_session()._method_counts["blockchain.block.headers"]
+        t1 = asyncio.create_task(interface.get_block_headers(start_height=1, count=5))
+        t2 = asyncio.create_task(interface.get_block_headers(start_height=1, count=5))
+        await asyncio.sleep(0)  # let both tasks send/join the request
+        t1.cancel()
+        res2 = await t2
+        self.assertEqual(5, len(res2))
+        self.assertTrue(t1.cancelled())
+        self.assertEqual(num_calls + 1, self._get_server_session()._method_counts["blockchain.block.headers"])
+
+    async def test_notification_after_cancelled_subscribe_and_unsubscribe(self):
+        interface = await self._start_iface_and_wait_for_sync()
+        session = interface.session
+        sh = "aa" * 32
+        queue = asyncio.Queue()
+        task = asyncio.create_task(session.subscribe('blockchain.scripthash.subscribe', [sh], queue))
+        server_session = self._get_server_session()
+        while sh not in server_session.subbed_scripthashes:  # request reached the server
+            await asyncio.sleep(0)
+        task.cancel()  # before the response arrives, so nothing gets cached
+        session.unsubscribe(queue)
+        # the server still considers us subscribed, and notifies us
+        await server_session.server_send_notifications(touched_sh=[sh])
+        await asyncio.sleep(0.1)
+        self.assertFalse(session.is_closing())
+        self.assertTrue(queue.empty())
+
+    async def test_get_relay_fee_does_not_truncate(self):
+        interface = await self._start_iface_and_wait_for_sync()
+        self._toyserver.min_relay_feerate = 29  # 2.9e-07 BTC/kvbyte, which is 28.999999999999996 sat as float
+        self.assertEqual(29, await interface.get_relay_fee())
+
     async def test_transaction_get(self):
         interface = await self._start_iface_and_wait_for_sync()
         # inject a tx into the server:
@@ -1,13 +1,15 @@
 import asyncio
 import tempfile
+import threading
 import unittest
-from typing import List
+from typing import List, Set
 
 from electrum import constants
 from electrum.simple_config import SimpleConfig
 from electrum import blockchain
-from electrum.interface import Interface, ServerAddr, ChainResolutionMode
-from electrum.crypto import sha256
+from electrum.interface import Interface, ServerAddr, ChainResolutionMode, RequestCorrupted
+from electrum.blockchain import CHUNK_SIZE, HEADER_SIZE
+from electrum.crypto import sha256, sha256d
 from electrum.util import OldTaskGroup
 from electrum import util
 
@@ -61,11 +63,15 @@ class MockNetwork:
         self.taskgroup = OldTaskGroup()
         self.proxy = None
 
+    def get_network_timeout_seconds(self, request_type=None) -> int:
+        return 10
+
 class MockInterface(Interface):
-    def __init__(self, config: SimpleConfig):
+    def __init__(self, config: SimpleConfig, *, network: MockNetwork = None, server: str = 'mock-server:50000:t'):
         self.config = config
-        network = MockNetwork(config)
-        super().__init__(network=network, server=ServerAddr.from_str('mock-server:50000:t'))
+        if network is None:
+            network = MockNetwork(config)
+        super().__init__(network=network, server=ServerAddr.from_str(server))
         self.q = asyncio.Queue()
 
     async def get_block_header(self, height: int, *, mode: ChainResolutionMode) -> dict:
@@ -82,6 +88,141 @@ class MockInterface(Interface):
     async def _maybe_warm_headers_cache(self, *args, **kwargs):
         return
 
+    async def _maybe_warm_headers_cache_at_heights(self, *args, **kwargs):
+        return
+
+
+class MockBlockchainWithFork:
+    """Local chain of side 'a' headers up to height, server forked to side 'b' at forkpoint."""
+
+    def __init__(self, *, height: int, forkpoint: int):
+        self._height = height
+        self.forkpoint = forkpoint
+
+    def get_server_header(self, height: int) -> dict:
+        side, prev_side = 'a' if height < self.forkpoint else 'b', 'a' if height <= self.forkpoint else 'b'
+        return {'block_height': height, 'mock': {'id': f'{height}{side}', 'prev_id': f'{height-1}{prev_side}'}}
+
+    def check_header(self, header: dict) -> bool:
+        return header['block_height'] <= self._height and header['mock']['id'].endswith('a')
+
+    def can_connect(self, header: dict, *, check_height: bool = True) -> bool:
+        assert not check_height
+        return self.check_header(header) or header['mock']['prev_id'].endswith('a')
+
+
+class RequestCountingMockInterface(MockInterface):
+    """Serves headers from a MockBlockchainWithFork, and counts network round-trips.
+    Unlike MockInterface, this uses the real _maybe_warm_headers_cache_at_heights.
+    """
+
+    def __init__(self, config: SimpleConfig, chain: MockBlockchainWithFork):
+        super().__init__(config)
+        self.chain = chain
+        self.num_roundtrips = 0
+        self.num_headers_requested = 0
+
+    async def _send_request_coalesced(self, method: str, params: list, *, timeout=None):
+        assert method == 'blockchain.block.header', method
+        self.num_headers_requested += 1
+        return bytes(80).hex()
+
+    async def _maybe_warm_headers_cache_at_heights(self, heights, *, mode):
+        if any(height not in self._headers_cache for height in heights):
+            self.num_roundtrips += 1
+        await Interface._maybe_warm_headers_cache_at_heights(self, heights, mode=mode)
+
+    async def _maybe_warm_headers_cache(self, *, from_height, to_height, mode):
+        if not self._is_headers_cache_covering(from_height, to_height):
+            self.num_roundtrips += 1
+            self.num_headers_requested += to_height - from_height + 1
+            self._add_to_headers_cache(from_height, [bytes(80)] * (to_height - from_height + 1))
+
+    async def get_block_header(self, height: int, *, mode: ChainResolutionMode) -> dict:
+        if height not in self._headers_cache:
+            self.num_roundtrips += 1
+            self.num_headers_requested += 1
+        return self.chain.get_server_header(height)
+
+
+class MockChunkBlockchain:
+
+    def __init__(self):
+        self.connected_chunks = []  # type: List[int]
+
+    @classmethod
+    def get_chunk(cls, index: int, size: int) -> bytes:
+        return bytes([index % 256]) * (size * HEADER_SIZE)
+
+    def connect_chunk(self, index: int, *, data: bytes) -> bool:
+        if data != self.get_chunk(index, len(data) // HEADER_SIZE):
+            return False
+        self.connected_chunks.append(index)
+        return True
+
+
+class ChunkServingMockInterface(MockInterface):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.requested_chunks = []  # type: List[int]
+        self.bad_chunks = set()  # type: Set[int]  # chunk indices this server sends garbage for
+        self.fail_requests = False
+
+    async def get_block_headers_concatenated(self, *, start_height: int, count: int, **kwargs) -> bytes:
+        index = start_height // CHUNK_SIZE
+        self.requested_chunks.append(index)
+        await asyncio.sleep(0)
+        if self.fail_requests:
+            raise RequestCorrupted("mock failure")
+        if index in self.bad_chunks:
+            return bytes(count * HEADER_SIZE)
+        return MockChunkBlockchain.get_chunk(index, count)
+
+
+class TestChunkDownloadFromPeers(ElectrumTestCase):
+    REGTEST = True
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.config = SimpleConfig({'electrum_path': self.electrum_path})
+        network = MockNetwork(self.config)
+        network.interfaces_lock = threading.Lock()
+        self.ifa = ChunkServingMockInterface(self.config, network=network, server='mock-server:50000:t')
+        self.peer = ChunkServingMockInterface(self.config, network=network, server='mock-peer:50000:t')
+        network.interfaces = {iface.server: iface for iface in (self.ifa, self.peer)}
+        for iface in (self.ifa, self.peer):
+            iface.ready.set_result(1)
+            iface.tip_header = {'block_height': 3 * CHUNK_SIZE - 1}
+        self.ifa.blockchain = MockChunkBlockchain()
+
+    async def test_chunks_are_spread_over_peers(self):
+        num_headers = await self.ifa._fast_forward_chain(height=0, tip=3 * CHUNK_SIZE - 1)
+        self.assertEqual(3 * CHUNK_SIZE, num_headers)
+        self.assertEqual([0, 1, 2], self.ifa.blockchain.connected_chunks)
+        self.assertEqual([0, 2], self.ifa.requested_chunks)
+        self.assertEqual([1], self.peer.requested_chunks)
+
+    async def test_fall_back_to_own_server_after_bad_chunk(self):
+        self.peer.bad_chunks = {1}
+        num_headers = await self.ifa._fast_forward_chain(height=0, tip=3 * CHUNK_SIZE - 1)
+        self.assertEqual(3 * CHUNK_SIZE, num_headers)
+        self.assertEqual([0, 1, 2], self.ifa.blockchain.connected_chunks)
+        self.assertEqual([0, 2, 1], self.ifa.requested_chunks)
+        # the peer is not used anymore
+        self.assertEqual([self.ifa], self.ifa._get_peers_for_chunk_download())
+        self.assertFalse(self.peer.got_disconnected.is_set())
+
+    async def test_fall_back_to_own_server_if_peer_request_fails(self):
+        self.peer.fail_requests = True
+        num_headers = await self.ifa._fast_forward_chain(height=0, tip=3 * CHUNK_SIZE - 1)
+        self.assertEqual(3 * CHUNK_SIZE, num_headers)
+        self.assertEqual([0, 1, 2], self.ifa.blockchain.connected_chunks)
+        self.assertEqual([1], self.peer.requested_chunks)
+        self.assertEqual([0, 1, 2], sorted(self.ifa.requested_chunks))
+        # the error did not propagate into the peer's taskgroup (which would tear down that interface)
+        await self.peer.taskgroup.join()
+
 
 class TestHeaderChainResolution(ElectrumTestCase):
 
@@ -263,6 +404,58 @@ class TestHeaderChainResolution(ElectrumTestCase):
         self.assertEqual(ifa.q.qsize(), 0)
         self.assertEqual(len(blockchain.blockchains), 2)
 
+    async def test_prune_headers_cache_keeps_only_ancestors_of_tip(self):
+        def make_header(prev_header: bytes, nonce: int) -> bytes:
+            return bytes(4) + sha256d(prev_header) + bytes(40) + nonce.to_bytes(4, 'little')
+        headers = [bytes(80)]
+        for height in range(1, 6):
+            headers.append(make_header(headers[-1], height))
+        ifa = self.interface
+        ifa._headers_cache = {height: raw for height, raw in enumerate(headers)}
+        # server reorged: new tip at height 4, replacing the old headers at heights 4 and 5
+        ifa.tip = 4
+        ifa._headers_cache[4] = make_header(headers[3], 1000)
+        ifa._prune_headers_cache()
+        self.assertEqual([0, 1, 2, 3, 4], sorted(ifa._headers_cache))
+        self.assertEqual([(0, 4)], ifa._headers_cache_intervals)
+        # a header that does not link to its child breaks the chain
+        ifa._headers_cache[2] = make_header(headers[1], 1000)
+        ifa._prune_headers_cache()
+        self.assertEqual([3, 4], sorted(ifa._headers_cache))
+        # if the tip itself is not cached, nothing is kept
+        ifa.tip = 5
+        ifa._prune_headers_cache()
+        self.assertEqual({}, ifa._headers_cache)
+        self.assertEqual([], ifa._headers_cache_intervals)
+
+    async def test_binary_search_prefetches_two_steps_ahead(self):
+        chain = MockBlockchainWithFork(height=10**6, forkpoint=654_321)
+        blockchain.blockchains = {"00a": chain}
+        ifa = RequestCountingMockInterface(self.config, chain)
+        bad_header = chain.get_server_header(10**6)
+        good, bad, bad_header = await ifa._search_headers_binary(0, 10**6, bad_header, chain)
+        self.assertEqual((654_320, 654_321), (good, bad))
+        self.assertEqual(654_321, bad_header['block_height'])
+        # 9 steps over intervals larger than MAX_NUM_HEADERS_PER_REQUEST, each round-trip covering 3 steps,
+        # plus one round-trip for the final interval
+        self.assertEqual(3 + 1, ifa.num_roundtrips)
+
+    async def test_headers_cache_coverage(self):
+        ifa = self.interface
+        ifa._add_to_headers_cache(10, [bytes(80)] * 5)  # [10, 14]
+        ifa._add_to_headers_cache(20, [bytes(80)] * 5)  # [20, 24]
+        self.assertTrue(ifa._is_headers_cache_covering(10, 14))
+        self.assertTrue(ifa._is_headers_cache_covering(21, 23))
+        self.assertFalse(ifa._is_headers_cache_covering(9, 14))
+        self.assertFalse(ifa._is_headers_cache_covering(12, 20))
+        self.assertFalse(ifa._is_headers_cache_covering(25, 25))
+        ifa._add_to_headers_cache(15, [bytes(80)] * 5)  # [15, 19], fills the gap
+        self.assertEqual([(10, 24)], ifa._headers_cache_intervals)
+        self.assertTrue(ifa._is_headers_cache_covering(10, 24))
+        ifa._add_to_headers_cache(5, [bytes(80)] * 30)  # [5, 34], contains existing
+        self.assertEqual([(5, 34)], ifa._headers_cache_intervals)
+        self.assertEqual(list(range(5, 35)), sorted(ifa._headers_cache))
+
 
 if __name__ == "__main__":
     constants.BitcoinRegtest.set_as_network()